@@ -1,49 +1,266 @@
 from flask import Flask, request, jsonify, render_template
-from pymongo import MongoClient
-from datetime import datetime, timezone
+from flask.json.provider import JSONProvider
+from bson import ObjectId
+from bson.errors import InvalidDocument
+from pymongo import InsertOne
+from pymongo.errors import BulkWriteError
 import os
-import hmac
-import hashlib
-from dotenv import load_dotenv
+import queue
+import threading
+import time
+import atexit
+from collections import deque
+import orjson
 
-load_dotenv()
-
-app = Flask(__name__)
-
-# -------------------- MongoDB --------------------
-client = MongoClient(os.getenv("MONGODB_URI"))
-db = client[os.getenv("DATABASE_NAME")]
-collection = db[os.getenv("COLLECTION_NAME")]
-
-WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET")
+import webhook_core
+from webhook_core import (
+    SUPPORTED_EVENTS,
+    WEBHOOK_SECRET,
+    extract_github_data,
+    format_message,
+    now_iso,
+    verify_signature,
+)
 
 
-# -------------------- Helpers --------------------
-def verify_signature(payload, signature):
-    if not WEBHOOK_SECRET:
-        return True
+# -------------------- JSON --------------------
+class OrjsonProvider(JSONProvider):
+    """Route request.json and jsonify through orjson."""
 
-    expected = "sha256=" + hmac.new(
-        WEBHOOK_SECRET.encode(),
-        payload,
-        hashlib.sha256
-    ).hexdigest()
+    def dumps(self, obj, **kwargs):
+        return orjson.dumps(obj, option=orjson.OPT_UTC_Z | orjson.OPT_NAIVE_UTC).decode()
 
-    return hmac.compare_digest(expected, signature)
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
 
 
-def format_message(event):
-    dt = datetime.fromisoformat(event["timestamp"].replace("Z", "+00:00"))
-    time = dt.strftime("%d %B %Y - %I:%M %p UTC")
-
-    if event["action"] == "PUSH":
-        return f'{event["author"]} pushed to {event["to_branch"]} on {time}'
-
-    if event["action"] == "PULL_REQUEST":
-        return f'{event["author"]} opened a pull request from {event["from_branch"]} to {event["to_branch"]} on {time}'
-
-    if event["action"] == "MERGE":
-        return f'{event["author"]} merged {event["from_branch"]} into {event["to_branch"]} on {time}'
+app = Flask(__name__)
+app.json = OrjsonProvider(app)
+
+
+# -------------------- Latest Events Cache --------------------
+# Newest-first copy of recent events, fed by the insert flusher so dashboard
+# polls are served from memory. Primed from MongoDB on the first read and
+# re-read every LATEST_CACHE_TTL seconds to pick up other processes' writes.
+LATEST_CACHE_SIZE = 50
+LATEST_CACHE_TTL = 30
+LATEST_EVENTS_LIMIT = 10
+LATEST_EVENT_FIELDS = {
+    "author": 1,
+    "action": 1,
+    "from_branch": 1,
+    "to_branch": 1,
+    "timestamp": 1,
+    "formatted_timestamp": 1,
+    "message": 1,
+}
+
+latest_cache = deque(maxlen=LATEST_CACHE_SIZE)
+latest_cache_lock = threading.Lock()
+latest_cache_primed_at = None
+latest_cache_version = 0
+latest_cache_etag = ""
+
+
+def update_latest_etag():
+    # Caller holds latest_cache_lock.
+    global latest_cache_version, latest_cache_etag
+
+    latest_cache_version += 1
+    newest = latest_cache[0].get("timestamp", "") if latest_cache else ""
+    latest_cache_etag = f"{latest_cache_version}-{newest}"
+
+
+def prime_latest_cache():
+    global latest_cache_primed_at
+
+    with latest_cache_lock:
+        now = time.monotonic()
+        primed = latest_cache_primed_at is not None
+        if primed and now - latest_cache_primed_at < LATEST_CACHE_TTL:
+            return
+
+        try:
+            events = list(webhook_core.get_collection().aggregate([
+                {"$sort": {"timestamp": -1}},
+                {"$limit": LATEST_CACHE_SIZE},
+                {"$project": LATEST_EVENT_FIELDS},
+            ], hint=[("timestamp", -1)]))
+        except Exception as e:
+            if not primed:
+                raise
+            # Keep serving the last snapshot and try again after another TTL.
+            app.logger.warning("Latest events refresh failed: %s", e)
+            latest_cache_primed_at = now
+            return
+
+        # Only a real change should invalidate clients' ETags.
+        changed = [doc["_id"] for doc in events] != [doc["_id"] for doc in latest_cache]
+        latest_cache.clear()
+        latest_cache.extend(events)
+        latest_cache_primed_at = now
+        if changed or not primed:
+            update_latest_etag()
+
+
+def cache_latest(docs):
+    with latest_cache_lock:
+        # Until primed, the first read picks these up from MongoDB instead.
+        if latest_cache_primed_at is None:
+            return
+
+        # Priming may already have read these from MongoDB.
+        cached_ids = {doc["_id"] for doc in latest_cache}
+        new_docs = [dict(doc) for doc in docs if doc["_id"] not in cached_ids]
+        if not new_docs:
+            return
+
+        # Retried batches are written after newer events, so merge by
+        # timestamp rather than write order. Later arrivals win ties.
+        merged = sorted(
+            [*reversed(new_docs), *latest_cache],
+            key=lambda doc: doc.get("timestamp", ""),
+            reverse=True
+        )
+        latest_cache.clear()
+        latest_cache.extend(merged[:LATEST_CACHE_SIZE])
+        update_latest_etag()
+
+
+def get_latest_events(limit):
+    """Return the newest events and the ETag identifying that snapshot"""
+    prime_latest_cache()
+    with latest_cache_lock:
+        return list(latest_cache)[:limit], latest_cache_etag
+
+
+# -------------------- Insert Queue --------------------
+# Webhooks only enqueue events; a background thread drains the queue into
+# unordered bulk writes so the request never waits on a MongoDB round-trip.
+# Failed writes are retried until they succeed. The queue is bounded, so a
+# long outage turns into 503s for new webhooks instead of lost events.
+INSERT_BATCH_SIZE = 500
+INSERT_QUEUE_SIZE = 10000
+INSERT_FLUSH_INTERVAL = 0.2
+INSERT_RETRY_DELAY = 1.0
+DUPLICATE_KEY_ERROR = 11000
+
+insert_queue = queue.Queue(maxsize=INSERT_QUEUE_SIZE)
+
+
+def drain_queue(q, max_items, timeout):
+    batch = []
+    try:
+        batch.append(q.get(timeout=timeout))
+    except queue.Empty:
+        return batch
+
+    while len(batch) < max_items:
+        try:
+            batch.append(q.get_nowait())
+        except queue.Empty:
+            break
+
+    return batch
+
+
+def write_batch(batch):
+    """Insert queued events and return the ones to retry"""
+    try:
+        webhook_core.get_collection().bulk_write([InsertOne(doc) for doc in batch], ordered=False)
+    except BulkWriteError as e:
+        # Unordered writes keep going past failures. Duplicates are already
+        # stored; any other write error is a permanent rejection.
+        errors = e.details.get("writeErrors", [])
+        duplicates = {err["index"] for err in errors if err.get("code") == DUPLICATE_KEY_ERROR}
+        rejected = {err["index"] for err in errors} - duplicates
+        for err in errors:
+            if err["index"] in rejected:
+                app.logger.error(
+                    "Dropping event rejected by MongoDB (code %s): %s",
+                    err.get("code"), err.get("errmsg")
+                )
+
+        if e.details.get("writeConcernErrors"):
+            # Unconfirmed writes are retried; stored ones come back as duplicates.
+            unconfirmed = [
+                doc for i, doc in enumerate(batch)
+                if i not in rejected and i not in duplicates
+            ]
+            app.logger.warning("Write concern not satisfied, retrying %d events", len(unconfirmed))
+            cache_latest([batch[i] for i in duplicates])
+            return unconfirmed
+
+        cache_latest([doc for i, doc in enumerate(batch) if i not in rejected])
+        return []
+    except InvalidDocument as e:
+        # The driver cannot encode a document. Write the batch one by one so
+        # only the bad document is dropped.
+        if len(batch) > 1:
+            return [retry for doc in batch for retry in write_batch([doc])]
+
+        app.logger.error("Dropping event that cannot be encoded: %s", e)
+        return []
+    except Exception as e:
+        # Connection, auth or configuration problems: keep the events.
+        app.logger.warning("Bulk write failed, retrying %d events: %s", len(batch), e)
+        return batch
+
+    cache_latest(batch)
+    return []
+
+
+def flush_inserts():
+    pending = []
+    while True:
+        try:
+            # Top up retried events with new ones, up to a full batch.
+            if len(pending) < INSERT_BATCH_SIZE:
+                timeout = 0 if pending else INSERT_FLUSH_INTERVAL
+                pending += drain_queue(insert_queue, INSERT_BATCH_SIZE - len(pending), timeout)
+            if not pending:
+                continue
+
+            pending = write_batch(pending)
+            if pending:
+                time.sleep(INSERT_RETRY_DELAY)
+        except Exception:
+            # Never let the flusher die; later events would queue forever.
+            app.logger.exception("Insert flusher error")
+            time.sleep(INSERT_RETRY_DELAY)
+
+
+def flush_remaining():
+    while not insert_queue.empty():
+        failed = write_batch(drain_queue(insert_queue, INSERT_BATCH_SIZE, 0))
+        if failed:
+            # MongoDB is unreachable; don't block shutdown on every batch.
+            dropped = len(failed) + insert_queue.qsize()
+            app.logger.error("Dropping %d queued events at shutdown", dropped)
+            return
+
+
+# Started on the first enqueue rather than at import: with preload_app the
+# import happens in the gunicorn master, which never receives webhooks.
+flusher_pid = None
+flusher_lock = threading.Lock()
+
+
+def enqueue_event(event):
+    global flusher_pid
+
+    if flusher_pid != os.getpid():
+        with flusher_lock:
+            if flusher_pid != os.getpid():
+                threading.Thread(target=flush_inserts, daemon=True).start()
+                flusher_pid = os.getpid()
+
+    # Fixed up front so retries are idempotent and the cache can dedupe.
+    event.setdefault("_id", ObjectId())
+    insert_queue.put_nowait(event)
+
+
+atexit.register(flush_remaining)
 
 
 # -------------------- Routes --------------------
@@ -52,74 +269,57 @@ def index():
     return render_template("index.html")
 
 
+@app.route("/health")
+def health_check():
+    return jsonify({"status": "healthy", "timestamp": now_iso()}), 200
+
+
 @app.route("/webhook", methods=["POST"])
 def webhook():
-    signature = request.headers.get("X-Hub-Signature-256")
-    if WEBHOOK_SECRET and not signature:
-        return jsonify({"error": "Missing signature"}), 400
+    # Only read the raw body for verification when a secret is configured;
+    # cache=True lets request.json reuse the same buffer afterwards.
+    if WEBHOOK_SECRET:
+        signature = request.headers.get("X-Hub-Signature-256")
+        if not signature:
+            return jsonify({"error": "Missing signature"}), 400
 
-    if not verify_signature(request.get_data(), signature):
-        return jsonify({"error": "Invalid signature"}), 401
+        if not verify_signature(request.get_data(cache=True), signature):
+            return jsonify({"error": "Invalid signature"}), 401
 
     event_type = request.headers.get("X-GitHub-Event")
-    payload = request.json
-
-    author = payload.get("sender", {}).get("login", "Unknown")
-    timestamp = datetime.now(timezone.utc).isoformat()
-
-    event = None
-
-    # -------- PUSH --------
-    if event_type == "push":
-        branch = payload.get("ref", "").replace("refs/heads/", "")
-        commit_id = payload.get("head_commit", {}).get("id", "unknown")
-
-        event = {
-            "request_id": commit_id,
-            "author": author,
-            "action": "PUSH",
-            "from_branch": branch,
-            "to_branch": branch,
-            "timestamp": timestamp
-        }
-
-    # -------- PULL REQUEST --------
-    elif event_type == "pull_request":
-        pr = payload["pull_request"]
-        action = payload["action"]
-
-        if action == "opened":
-            action_type = "PULL_REQUEST"
-        elif action == "closed" and pr.get("merged"):
-            action_type = "MERGE"
-        else:
-            return jsonify({"message": "Ignored"}), 200
-
-        event = {
-            "request_id": pr["id"],
-            "author": author,
-            "action": action_type,
-            "from_branch": pr["head"]["ref"],
-            "to_branch": pr["base"]["ref"],
-            "timestamp": timestamp
-        }
-
-    else:
+    if event_type not in SUPPORTED_EVENTS:
         return jsonify({"message": "Event not supported"}), 200
 
+    event = extract_github_data(request.json, event_type)
+    if event is None:
+        return jsonify({"message": "Ignored"}), 200
+
     # -------- SAVE --------
-    print("INSERTING:", event)
-    collection.insert_one(event)
+    app.logger.info("Queued %s event %s", event["action"], event["request_id"])
+    try:
+        enqueue_event(event)
+    except queue.Full:
+        app.logger.error("Insert queue full, rejecting event")
+        return jsonify({"error": "Event queue full"}), 503
 
-    return jsonify({"message": "Stored successfully"}), 200
+    return jsonify({"message": "Queued"}), 202
 
 
 @app.route("/api/events/latest")
 def latest_events():
-    events = list(collection.find({}, {"_id": 0}).sort("timestamp", -1).limit(10))
-    return jsonify([
-        {"message": format_message(e)} for e in events
-    ])
+    events, etag = get_latest_events(LATEST_EVENTS_LIMIT)
+
+    # Polls that have already seen this snapshot skip serialization entirely.
+    if request.if_none_match.contains_weak(etag):
+        response = app.response_class(status=304)
+    else:
+        response = jsonify([
+            {"message": e.get("message") or format_message(e)} for e in events
+        ])
+
+    response.set_etag(etag, weak=True)
+    response.headers["Cache-Control"] = "no-cache"
+    return response
 
 
 # -------------------- Run --------------------
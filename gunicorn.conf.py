@@ -0,0 +1,24 @@
+# preload_app imports the app in the master before any worker starts, so
+# gevent has to patch the stdlib here rather than in each worker.
+from gevent import monkey
+
+monkey.patch_all()
+
+import os
+
+# -------------------- Workers --------------------
+# gevent workers yield on socket I/O, so a single worker keeps serving
+# webhooks and polls while others wait on MongoDB.
+worker_class = "gevent"
+worker_connections = int(os.getenv("WORKER_CONNECTIONS", 1000))
+
+# The latest-events cache and insert queue live in-process, so this must
+# stay at one worker. Deliberately not read from WEB_CONCURRENCY, which
+# Heroku-style platforms set automatically.
+workers = 1
+
+# Import the app once and fork workers from it. MongoDB is only connected on
+# first use (webhook_core.get_collection), so no sockets are shared.
+preload_app = True
+
+bind = f"0.0.0.0:{os.getenv('PORT', 5000)}"
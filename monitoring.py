@@ -1,4 +1,7 @@
 import requests
+from requests.adapters import HTTPAdapter
+from concurrent.futures import ThreadPoolExecutor
+from pymongo import MongoClient
 import json
 from datetime import datetime, timedelta
 import smtplib
@@ -11,12 +14,35 @@ class SystemMonitor:
         self.mongodb_uri = mongodb_uri
         self.alert_email = alert_email
         self.logger = logging.getLogger(__name__)
+        
+        # Keep-alive session so probes reuse the connection to the webhook host
+        adapter = HTTPAdapter(pool_connections=2, pool_maxsize=4)
+        self._session = requests.Session()
+        self._session.mount('https://', adapter)
+        self._session.mount('http://', adapter)
+        
+        # Created lazily by _client() so connection errors surface inside the checks
+        self._mongo = None
+    
+    def _client(self):
+        """Pooled MongoDB client shared by every check"""
+        # mongodb+srv URIs resolve DNS in the constructor, so this can raise;
+        # it is only called inside the checks' try blocks and retried next time.
+        if self._mongo is None:
+            self._mongo = MongoClient(self.mongodb_uri, serverSelectionTimeoutMS=5000, maxPoolSize=4)
+        return self._mongo
     
     def check_webhook_endpoint(self):
         """Check if webhook endpoint is responsive"""
         try:
-            response = requests.get(self.webhook_url, timeout=10)
-            health_response = requests.get(f"{self.webhook_url.rstrip('/')}/health", timeout=10)
+            # Both probes are independent, so send them concurrently
+            with ThreadPoolExecutor(max_workers=2) as executor:
+                webhook_future = executor.submit(self._session.get, self.webhook_url, timeout=10)
+                health_future = executor.submit(
+                    self._session.get, f"{self.webhook_url.rstrip('/')}/health", timeout=10
+                )
+                response = webhook_future.result()
+                health_response = health_future.result()
             
             return {
                 'status': 'healthy' if response.status_code == 200 else 'unhealthy',
@@ -31,10 +57,8 @@ class SystemMonitor:
     def check_database_connection(self):
         """Check MongoDB connection"""
         try:
-            from pymongo import MongoClient
-            client = MongoClient(self.mongodb_uri, serverSelectionTimeoutMS=5000)
-            client.server_info()  # Will raise exception if can't connect
-            return {'status': 'connected', 'databases': client.list_database_names()[:5]}
+            self._client().admin.command('ping')  # Will raise exception if can't connect
+            return {'status': 'connected', 'databases': self._client().list_database_names()[:5]}
         except Exception as e:
             self.logger.error(f"Database connection check failed: {str(e)}")
             return {'status': 'disconnected', 'error': str(e)}
@@ -42,10 +66,8 @@ class SystemMonitor:
     def check_recent_activity(self):
         """Check for recent activity in the system"""
         try:
-            from pymongo import MongoClient
-            client = MongoClient(self.mongodb_uri)
-            db = client.get_database()
-            collection = db.events
+            # No I/O here; raises inside the try if the URI has no default database
+            collection = self._client().get_database().events
             
             # Count events in last hour
             one_hour_ago = datetime.utcnow() - timedelta(hours=1)
@@ -62,7 +84,7 @@ class SystemMonitor:
             return {
                 'recent_events_count': recent_count,
                 'latest_event': latest['timestamp'] if latest else None,
-                'total_events': collection.count_documents({})
+                'total_events': collection.estimated_document_count()
             }
         except Exception as e:
             self.logger.error(f"Activity check failed: {str(e)}")
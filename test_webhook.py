@@ -1,26 +1,111 @@
 import requests
-import json
+from requests.adapters import HTTPAdapter
+from concurrent.futures import ThreadPoolExecutor
+import orjson
 import hmac
 import hashlib
-from datetime import datetime
+import time
+
+# Stands in for the event timestamps in the pre-encoded payload templates
+TIMESTAMP_PLACEHOLDER = "__TIMESTAMP__"
+TIMESTAMP_PLACEHOLDER_BYTES = TIMESTAMP_PLACEHOLDER.encode("utf-8")
+
+
+# (epoch second, formatted) - timestamps only change once per second
+_iso_cache = (-1, "")
+
+
+def iso_utc_now():
+    """Current UTC time as an ISO-8601 string, without building a datetime"""
+    global _iso_cache
+
+    second = time.time_ns() // 1_000_000_000
+    if second != _iso_cache[0]:
+        t = time.gmtime(second)
+        _iso_cache = (second, (
+            f"{t.tm_year:04d}-{t.tm_mon:02d}-{t.tm_mday:02d}"
+            f"T{t.tm_hour:02d}:{t.tm_min:02d}:{t.tm_sec:02d}Z"
+        ))
+    return _iso_cache[1]
 
 
 class WebhookTester:
     def __init__(self, webhook_url, secret):
         self.webhook_url = webhook_url
         self.secret = secret
+        self._secret_bytes = secret.encode("utf-8") if isinstance(secret, str) else secret
+        # Keyed once; each signature copies the primed ipad/opad state
+        self._hmac_template = hmac.new(self._secret_bytes, digestmod=hashlib.sha256)
+
+        # Keep-alive session so repeated events reuse one connection
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=32, max_retries=0)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.session.headers.update({"Content-Type": "application/json"})
+
+        # Payloads are encoded once; only the timestamp changes per event
+        self._push_template = orjson.dumps(self.push_payload(TIMESTAMP_PLACEHOLDER))
+        self._pr_opened_template = orjson.dumps(self.pull_request_opened_payload(TIMESTAMP_PLACEHOLDER))
+        self._pr_merged_template = orjson.dumps(self.pull_request_merged_payload(TIMESTAMP_PLACEHOLDER))
+
+        # Static per-event headers; only the signature is added per send
+        self._push_headers = {"X-GitHub-Event": "push"}
+        self._pull_request_headers = {"X-GitHub-Event": "pull_request"}
 
-    def generate_signature(self, payload):
-        """Generate GitHub webhook signature"""
-        signature = hmac.new(
-            self.secret.encode("utf-8"),
-            json.dumps(payload).encode("utf-8"),
-            hashlib.sha256
-        ).hexdigest()
-        return f"sha256={signature}"
+    def close(self):
+        """Release pooled connections"""
+        self.session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def generate_signature(self, body):
+        """Generate GitHub webhook signature for the exact bytes being sent"""
+        mac = self._hmac_template.copy()
+        mac.update(body)
+        return "sha256=" + mac.hexdigest()
+
+    def send_event(self, template, base_headers):
+        """Fill in the current timestamp, sign and POST a payload template"""
+        timestamp = iso_utc_now().encode("utf-8")
+        body = template.replace(TIMESTAMP_PLACEHOLDER_BYTES, timestamp)
+
+        # Copy rather than mutate: fire_all sends from several threads
+        headers = base_headers.copy()
+        headers["X-Hub-Signature-256"] = self.generate_signature(body)
+
+        return self.session.post(self.webhook_url, data=body, headers=headers)
 
     def test_push_event(self):
         """Test PUSH event webhook"""
+        return self.send_event(self._push_template, self._push_headers)
+
+    def test_pull_request_opened(self):
+        """Test PULL_REQUEST opened event"""
+        return self.send_event(self._pr_opened_template, self._pull_request_headers)
+
+    def test_pull_request_merged(self):
+        """Test PULL_REQUEST merged event"""
+        return self.send_event(self._pr_merged_template, self._pull_request_headers)
+
+    def fire_all(self, n=1, max_workers=8):
+        """Send n rounds of all three events concurrently, responses in send order"""
+        senders = [
+            self.test_push_event,
+            self.test_pull_request_opened,
+            self.test_pull_request_merged
+        ] * n
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            return list(executor.map(lambda send: send(), senders))
+
+    @staticmethod
+    def push_payload(timestamp):
+        """PUSH event payload"""
         payload = {
             "ref": "refs/heads/main",
             "before": "abc123",
@@ -34,7 +119,7 @@ class WebhookTester:
                 {
                     "id": "def456",
                     "message": "Test commit message",
-                    "timestamp": datetime.utcnow().isoformat() + "Z",
+                    "timestamp": timestamp,
                     "author": {
                         "name": "Test User",
                         "email": "test@example.com"
@@ -44,7 +129,7 @@ class WebhookTester:
             "head_commit": {
                 "id": "def456",
                 "message": "Test commit message",
-                "timestamp": datetime.utcnow().isoformat() + "Z",
+                "timestamp": timestamp,
                 "author": {
                     "name": "Test User",
                     "email": "test@example.com"
@@ -63,16 +148,11 @@ class WebhookTester:
             }
         }
 
-        headers = {
-            "Content-Type": "application/json",
-            "X-GitHub-Event": "push",
-            "X-Hub-Signature-256": self.generate_signature(payload)
-        }
+        return payload
 
-        return requests.post(self.webhook_url, json=payload, headers=headers)
-
-    def test_pull_request_opened(self):
-        """Test PULL_REQUEST opened event"""
+    @staticmethod
+    def pull_request_opened_payload(timestamp):
+        """PULL_REQUEST opened event payload"""
         payload = {
             "action": "opened",
             "number": 1,
@@ -82,8 +162,8 @@ class WebhookTester:
                 "state": "open",
                 "title": "Test Pull Request",
                 "body": "This is a test PR",
-                "created_at": datetime.utcnow().isoformat() + "Z",
-                "updated_at": datetime.utcnow().isoformat() + "Z",
+                "created_at": timestamp,
+                "updated_at": timestamp,
                 "merged": False,
                 "mergeable": True,
                 "head": {
@@ -109,16 +189,11 @@ class WebhookTester:
             }
         }
 
-        headers = {
-            "Content-Type": "application/json",
-            "X-GitHub-Event": "pull_request",
-            "X-Hub-Signature-256": self.generate_signature(payload)
-        }
+        return payload
 
-        return requests.post(self.webhook_url, json=payload, headers=headers)
-
-    def test_pull_request_merged(self):
-        """Test PULL_REQUEST merged event"""
+    @staticmethod
+    def pull_request_merged_payload(timestamp):
+        """PULL_REQUEST merged event payload"""
         payload = {
             "action": "closed",
             "number": 1,
@@ -128,9 +203,9 @@ class WebhookTester:
                 "state": "closed",
                 "title": "Test Pull Request",
                 "body": "This is a test PR",
-                "created_at": datetime.utcnow().isoformat() + "Z",
-                "updated_at": datetime.utcnow().isoformat() + "Z",
-                "closed_at": datetime.utcnow().isoformat() + "Z",
+                "created_at": timestamp,
+                "updated_at": timestamp,
+                "closed_at": timestamp,
                 "merged": True,
                 "mergeable": None,
                 "merged_by": {
@@ -159,29 +234,17 @@ class WebhookTester:
             }
         }
 
-        headers = {
-            "Content-Type": "application/json",
-            "X-GitHub-Event": "pull_request",
-            "X-Hub-Signature-256": self.generate_signature(payload)
-        }
-
-        return requests.post(self.webhook_url, json=payload, headers=headers)
+        return payload
 
 
 # --------------------
 # Usage
 # --------------------
 if __name__ == "__main__":
-    tester = WebhookTester(
+    with WebhookTester(
         "https://your-webhook-url.com/webhook",
         "your_secret"
-    )
-
-    push_result = tester.test_push_event()
-    print(f"PUSH Status: {push_result.status_code}, Response: {push_result.text}")
-
-    pr_open_result = tester.test_pull_request_opened()
-    print(f"PR OPEN Status: {pr_open_result.status_code}, Response: {pr_open_result.text}")
-
-    pr_merge_result = tester.test_pull_request_merged()
-    print(f"PR MERGED Status: {pr_merge_result.status_code}, Response: {pr_merge_result.text}")
+    ) as tester:
+        labels = ["PUSH", "PR OPEN", "PR MERGED"]
+        for label, result in zip(labels, tester.fire_all()):
+            print(f"{label} Status: {result.status_code}, Response: {result.text}")
@@ -1,31 +1,37 @@
 import unittest
-import json
 from datetime import datetime
+from unittest.mock import MagicMock, patch
+from bson.errors import InvalidDocument
+from pymongo.errors import AutoReconnect, BulkWriteError, OperationFailure
+import app as webhook_app
+import webhook_core
 from app import app, verify_signature, extract_github_data
 
 class TestWebhookReceiver(unittest.TestCase):
     
-    def setUp(self):
-        self.app = app.test_client()
-        self.app.testing = True
+    @classmethod
+    def setUpClass(cls):
+        # One client for the whole class; tests don't mutate app state
+        app.testing = True
+        cls.client = app.test_client()
         
     def test_health_endpoint(self):
         """Test health check endpoint"""
-        response = self.app.get('/health')
+        response = self.client.get('/health')
         self.assertEqual(response.status_code, 200)
-        data = json.loads(response.data)
-        self.assertEqual(data['status'], 'healthy')
+        # Responses are compact orjson output, so match the raw bytes
+        self.assertIn(b'"status":"healthy"', response.data)
     
     def test_webhook_signature_verification(self):
         """Test signature verification"""
-        secret = 'test_secret'
+        secret = b'test_secret'
         payload = b'{"test": "data"}'
         
         # Test with correct signature
         import hmac
         import hashlib
         signature = 'sha256=' + hmac.new(
-            secret.encode('utf-8'),
+            secret,
             payload,
             hashlib.sha256
         ).hexdigest()
@@ -35,6 +41,27 @@ class TestWebhookReceiver(unittest.TestCase):
         # Test with incorrect signature
         self.assertFalse(verify_signature(payload, 'sha256=wrong'))
     
+    def test_webhook_signature_malformed(self):
+        """Test signature verification rejects malformed headers"""
+        import hmac
+        import hashlib
+        
+        payload = b'{"test": "data"}'
+        template = hmac.new(b'test_secret', digestmod=hashlib.sha256)
+        
+        with patch.object(webhook_core, 'WEBHOOK_SECRET', 'test_secret'), \
+             patch.object(webhook_core, '_HMAC_TEMPLATE', template):
+            self.assertFalse(verify_signature(payload, None))
+            self.assertFalse(verify_signature(payload, 'sha1=' + 'ab' * 20))
+            self.assertFalse(verify_signature(payload, 'sha256=' + 'zz' * 32))
+            
+            # Valid hex of the wrong digest length
+            self.assertFalse(verify_signature(payload, 'sha256=' + 'ab' * 16))
+            
+            # Sanity check: a correct signature still passes
+            valid = 'sha256=' + hmac.new(b'test_secret', payload, hashlib.sha256).hexdigest()
+            self.assertTrue(verify_signature(payload, valid))
+    
     def test_extract_push_data(self):
         """Test data extraction from push event"""
         payload = {
@@ -72,19 +99,156 @@ class TestWebhookReceiver(unittest.TestCase):
     
     def test_webhook_without_signature(self):
         """Test webhook without signature"""
-        response = self.app.post('/webhook', 
+        response = self.client.post('/webhook', 
                                 json={'test': 'data'},
                                 headers={'X-GitHub-Event': 'push'})
         self.assertEqual(response.status_code, 400)
     
     def test_unsupported_event(self):
         """Test unsupported GitHub event"""
-        response = self.app.post('/webhook',
+        response = self.client.post('/webhook',
                                 json={'test': 'data'},
                                 headers={'X-GitHub-Event': 'issues'})
         self.assertEqual(response.status_code, 200)
-        data = json.loads(response.data)
-        self.assertIn('not supported', data['message'])
+        self.assertIn(b'not supported', response.data)
+
+class TestLatestEventsCache(unittest.TestCase):
+    
+    def setUp(self):
+        self.collection = MagicMock()
+        self.collection.aggregate.return_value = [
+            self.event(1, '2024-01-01T10:00:00.000000+00:00')
+        ]
+        patcher = patch.object(webhook_core, 'get_collection', return_value=self.collection)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        
+        # Every test starts from a cold cache
+        webhook_app.latest_cache.clear()
+        webhook_app.latest_cache_primed_at = None
+        self.client = app.test_client()
+    
+    @staticmethod
+    def event(event_id, timestamp):
+        return {'_id': event_id, 'timestamp': timestamp, 'message': f'event {event_id}'}
+    
+    def cached_ids(self):
+        events, _ = webhook_app.get_latest_events(webhook_app.LATEST_CACHE_SIZE)
+        return [e['_id'] for e in events]
+    
+    def test_latest_events_not_modified(self):
+        """Test a matching If-None-Match gets 304 without querying MongoDB"""
+        response = self.client.get('/api/events/latest')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b'event 1', response.data)
+        
+        response = self.client.get('/api/events/latest',
+                                   headers={'If-None-Match': response.headers['ETag']})
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.data, b'')
+        self.collection.aggregate.assert_called_once()
+    
+    def test_etag_changes_after_write_batch(self):
+        """Test a written batch changes the ETag and shows up newest first"""
+        first = self.client.get('/api/events/latest')
+        
+        webhook_app.write_batch([self.event(2, '2024-01-01T11:00:00.000000+00:00')])
+        
+        second = self.client.get('/api/events/latest',
+                                 headers={'If-None-Match': first.headers['ETag']})
+        self.assertEqual(second.status_code, 200)
+        self.assertNotEqual(first.headers['ETag'], second.headers['ETag'])
+        self.assertLess(second.data.index(b'event 2'), second.data.index(b'event 1'))
+    
+    def test_write_batch_merges_by_timestamp(self):
+        """Test a late (retried) older event is not listed above newer ones"""
+        self.cached_ids()
+        
+        webhook_app.write_batch([self.event(3, '2024-01-01T12:00:00.000000+00:00')])
+        webhook_app.write_batch([self.event(2, '2024-01-01T11:00:00.000000+00:00')])
+        # Already cached from priming
+        webhook_app.write_batch([self.event(1, '2024-01-01T10:00:00.000000+00:00')])
+        
+        self.assertEqual(self.cached_ids(), [3, 2, 1])
+    
+    def test_stale_cache_is_reread_from_mongodb(self):
+        """Test events written by another process show up after the TTL"""
+        first = self.client.get('/api/events/latest')
+        
+        self.collection.aggregate.return_value = [
+            self.event(2, '2024-01-01T11:00:00.000000+00:00'),
+            self.event(1, '2024-01-01T10:00:00.000000+00:00'),
+        ]
+        webhook_app.latest_cache_primed_at -= webhook_app.LATEST_CACHE_TTL
+        
+        second = self.client.get('/api/events/latest')
+        self.assertEqual(self.collection.aggregate.call_count, 2)
+        self.assertNotEqual(first.headers['ETag'], second.headers['ETag'])
+        self.assertIn(b'event 2', second.data)
+    
+    def test_unchanged_refresh_keeps_etag(self):
+        """Test a TTL refresh that finds nothing new still answers 304"""
+        first = self.client.get('/api/events/latest')
+        webhook_app.latest_cache_primed_at -= webhook_app.LATEST_CACHE_TTL
+        
+        second = self.client.get('/api/events/latest',
+                                 headers={'If-None-Match': first.headers['ETag']})
+        self.assertEqual(self.collection.aggregate.call_count, 2)
+        self.assertEqual(second.status_code, 304)
+    
+    def test_write_batch_partial_failure(self):
+        """Test duplicates count as stored and other write errors are dropped"""
+        self.cached_ids()
+        self.collection.bulk_write.side_effect = BulkWriteError({'writeErrors': [
+            {'index': 0, 'code': 11000, 'errmsg': 'duplicate key'},
+            {'index': 1, 'code': 121, 'errmsg': 'document failed validation'},
+        ]})
+        batch = [
+            self.event(2, '2024-01-01T11:00:00.000000+00:00'),
+            self.event(3, '2024-01-01T12:00:00.000000+00:00'),
+            self.event(4, '2024-01-01T13:00:00.000000+00:00'),
+        ]
+        
+        self.assertEqual(webhook_app.write_batch(batch), [])
+        self.assertEqual(self.cached_ids(), [4, 2, 1])
+    
+    def test_write_batch_retries_connection_errors(self):
+        """Test connection failures hand the whole batch back for retry"""
+        self.collection.bulk_write.side_effect = AutoReconnect('connection reset')
+        batch = [self.event(2, '2024-01-01T11:00:00.000000+00:00')]
+        
+        self.assertEqual(webhook_app.write_batch(batch), batch)
+    
+    def test_write_batch_keeps_events_on_server_errors(self):
+        """Test non-encoding failures (e.g. not authorized) never drop events"""
+        self.collection.bulk_write.side_effect = OperationFailure('not authorized', code=13)
+        batch = [
+            self.event(2, '2024-01-01T11:00:00.000000+00:00'),
+            self.event(3, '2024-01-01T12:00:00.000000+00:00'),
+        ]
+        
+        self.assertEqual(webhook_app.write_batch(batch), batch)
+    
+    def test_write_batch_drops_only_unencodable_event(self):
+        """Test an InvalidDocument batch is split so only the bad event is lost"""
+        self.cached_ids()
+        
+        def bulk_write(docs, ordered):
+            if any(doc['_id'] == 2 for doc in docs):
+                raise InvalidDocument('key must not contain NUL')
+        
+        self.collection.bulk_write.side_effect = bulk_write
+        # Hand the raw documents to the stub so it can spot the bad one
+        patcher = patch.object(webhook_app, 'InsertOne', side_effect=lambda doc: doc)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        batch = [
+            self.event(2, '2024-01-01T11:00:00.000000+00:00'),
+            self.event(3, '2024-01-01T12:00:00.000000+00:00'),
+        ]
+        
+        self.assertEqual(webhook_app.write_batch(batch), [])
+        self.assertEqual(self.cached_ids(), [3, 1])
 
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
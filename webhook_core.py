@@ -0,0 +1,165 @@
+from pymongo import MongoClient, WriteConcern, DESCENDING
+from pymongo.errors import OperationFailure
+from datetime import datetime, timezone
+import os
+import hmac
+import hashlib
+import time
+import functools
+from dotenv import load_dotenv
+
+load_dotenv()
+
+
+# -------------------- MongoDB --------------------
+# IndexOptionsConflict, IndexKeySpecsConflict
+INDEX_CONFLICT_ERRORS = (85, 86)
+
+
+# Connected on first use so importing this module (tests, health probes)
+# does not need MongoDB to be reachable.
+@functools.cache
+def get_collection():
+    client = MongoClient(os.getenv("MONGODB_URI"))
+    db = client[os.getenv("DATABASE_NAME")]
+    # Acknowledge on the primary without waiting for a journal sync per batch.
+    collection = db.get_collection(
+        os.getenv("COLLECTION_NAME"),
+        write_concern=WriteConcern(w=1, j=False)
+    )
+    # Lets sort("timestamp", -1).limit(n) walk n index entries instead of
+    # sorting the whole collection. ISO-8601 UTC strings sort chronologically.
+    try:
+        collection.create_index([("timestamp", DESCENDING)])
+    except OperationFailure as e:
+        # The same key pattern already exists under another name or options.
+        if e.code not in INDEX_CONFLICT_ERRORS:
+            raise
+    return collection
+
+
+# -------------------- Signature --------------------
+WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET")
+
+# Keyed once at import; each verification copies the primed HMAC state
+# instead of re-deriving the key schedule.
+_SECRET_BYTES = WEBHOOK_SECRET.encode("utf-8") if WEBHOOK_SECRET else None
+_HMAC_TEMPLATE = hmac.new(_SECRET_BYTES, digestmod=hashlib.sha256) if WEBHOOK_SECRET else None
+
+
+# -------------------- Helpers --------------------
+SUPPORTED_EVENTS = ("push", "pull_request")
+
+
+SIGNATURE_PREFIX = "sha256="
+
+
+def verify_signature(payload, signature):
+    if not WEBHOOK_SECRET:
+        return True
+
+    if not signature or not signature.startswith(SIGNATURE_PREFIX):
+        return False
+
+    # Compare the 32 raw digest bytes instead of 64 hex characters.
+    try:
+        provided = bytes.fromhex(signature[len(SIGNATURE_PREFIX):])
+    except ValueError:
+        return False
+
+    if len(provided) != _HMAC_TEMPLATE.digest_size:
+        return False
+
+    mac = _HMAC_TEMPLATE.copy()
+    mac.update(payload)
+
+    return hmac.compare_digest(mac.digest(), provided)
+
+
+# Webhooks arriving within the same 50 ms share one formatted timestamp.
+# abs() so a backwards clock step refreshes it instead of freezing it.
+TIMESTAMP_REFRESH_INTERVAL = 0.05
+_now = (0.0, "")
+
+
+def now_iso():
+    global _now
+
+    t = time.time()
+    if abs(t - _now[0]) > TIMESTAMP_REFRESH_INTERVAL:
+        _now = (t, datetime.fromtimestamp(t, timezone.utc).isoformat(timespec="microseconds"))
+    return _now[1]
+
+
+# Legacy events are re-formatted on every poll; they share a small set of
+# timestamps, so the parse + strftime is cached.
+@functools.lru_cache(maxsize=1024)
+def format_timestamp(timestamp):
+    dt = datetime.fromisoformat(timestamp.replace("Z", "+00:00"))
+    return dt.strftime("%d %B %Y - %I:%M %p UTC")
+
+
+MESSAGE_FORMATS = {
+    "PUSH": lambda e, when: f'{e["author"]} pushed to {e["to_branch"]} on {when}',
+    "PULL_REQUEST": lambda e, when: f'{e["author"]} opened a pull request from {e["from_branch"]} to {e["to_branch"]} on {when}',
+    "MERGE": lambda e, when: f'{e["author"]} merged {e["from_branch"]} into {e["to_branch"]} on {when}',
+}
+
+
+def format_message(event):
+    formatter = MESSAGE_FORMATS.get(event["action"])
+    if formatter is None:
+        return None
+
+    # Events stored before formatted_timestamp existed are formatted on read.
+    when = event.get("formatted_timestamp") or format_timestamp(event["timestamp"])
+    return formatter(event, when)
+
+
+def extract_github_data(payload, event_type):
+    """Build the event document for a webhook, or None if it is ignored"""
+    author = payload.get("sender", {}).get("login", "Unknown")
+    timestamp = now_iso()
+
+    # -------- PUSH --------
+    if event_type == "push":
+        branch = payload.get("ref", "").removeprefix("refs/heads/")
+        commit_id = payload.get("head_commit", {}).get("id", "unknown")
+
+        event = {
+            "request_id": commit_id,
+            "author": author,
+            "action": "PUSH",
+            "from_branch": branch,
+            "to_branch": branch,
+            "timestamp": timestamp
+        }
+
+    # -------- PULL REQUEST --------
+    elif event_type == "pull_request":
+        pr = payload["pull_request"]
+        action = payload["action"]
+
+        if action == "opened":
+            action_type = "PULL_REQUEST"
+        elif action == "closed" and pr.get("merged"):
+            action_type = "MERGE"
+        else:
+            return None
+
+        event = {
+            "request_id": pr["id"],
+            "author": author,
+            "action": action_type,
+            "from_branch": pr["head"]["ref"],
+            "to_branch": pr["base"]["ref"],
+            "timestamp": timestamp
+        }
+
+    else:
+        return None
+
+    # Formatted once here so the polling endpoints never have to.
+    event["formatted_timestamp"] = format_timestamp(timestamp)
+    event["message"] = format_message(event)
+    return event